@@ -6,16 +6,15 @@ import matplotlib
 # Use Agg backend for non-interactive plotting
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-from tqdm import tqdm
 
 from phono3py import Phono3py
 from phono3py.file_IO import write_FORCES_FC3
 from phonopy import Phonopy
 from phonopy.file_IO import write_force_constants_to_hdf5
-from phonopy.structure.atoms import PhonopyAtoms
-from ase import Atoms
-from pymatgen.core import Structure
-from pymatgen.io.ase import AseAtomsAdaptor
+
+from calculators.structure_utils import ensure_ase_atoms, to_phonopy_atoms, calc_supercell_forces
+from calculators.pipeline_utils import StagePipeline, DEFAULT_QUEUE_SIZE
+from calculators.stability_set import StabilitySet
 
 class KappaSet:
     def __init__(self, calculator):
@@ -27,25 +26,26 @@ class KappaSet:
         """
         self.calculator = calculator
 
-    def _to_phonopy_atoms(self, atoms: Atoms):
-        """Convert ASE Atoms to PhonopyAtoms."""
-        return PhonopyAtoms(symbols=atoms.get_chemical_symbols(),
-                            masses=atoms.get_masses(),
-                            positions=atoms.get_positions(),
-                            cell=atoms.get_cell())
-
-    def _ensure_ase_atoms(self, structure):
-        """Ensure input is ASE Atoms."""
-        if isinstance(structure, Atoms):
-            return structure
-        elif isinstance(structure, Structure):
-            return AseAtomsAdaptor.get_atoms(structure)
-        else:
-            raise ValueError(f"Unsupported structure type: {type(structure)}")
+    @staticmethod
+    def _produce_fc3(ph3, forces_fc3, work_dir):
+        """Build FC3 from supercell forces, write FORCES_FC3 / fc3.hdf5 to work_dir and return FC3."""
+        write_FORCES_FC3(ph3.dataset, forces_fc3, filename=os.path.join(work_dir, "FORCES_FC3"))
+        ph3.forces = np.array(forces_fc3, dtype='double', order='C')
+        ph3.produce_fc3()
+        ph3.save(os.path.join(work_dir, "fc3.hdf5"))
+        return ph3.fc3
+
+    @staticmethod
+    def _produce_fc2(ph2, work_dir):
+        """Build FC2 from ph2.forces, write fc2.hdf5 to work_dir and return FC2."""
+        ph2.produce_force_constants()
+        write_force_constants_to_hdf5(ph2.force_constants, filename=os.path.join(work_dir, 'fc2.hdf5'))
+        return ph2.force_constants
 
     def run_kappa(self, structure, dim_fc3=[2, 2, 2], dim_fc2=[2, 2, 2], 
                   mesh=[11, 11, 11], temp_range=np.arange(0, 1001, 10), 
-                  work_dir=".", primitive_matrix='auto'):
+                  work_dir=".", primitive_matrix='auto', is_pipeline=True, queue_size=DEFAULT_QUEUE_SIZE,
+                  stability_policy='abort', imag_tol=0.1):
         """
         Run the Thermal Conductivity calculation (FC3 + FC2).
 
@@ -57,22 +57,35 @@ class KappaSet:
             temp_range: List or array of temperatures. Default: 0 to 1000 step 10.
             work_dir: Directory to run the calculation in.
             primitive_matrix: Primitive matrix setting for Phono3py/Phonopy.
+            is_pipeline: If True, produce FC2, run the stability check and produce FC3 in a
+                worker process while the model keeps evaluating forces. If False, all stages
+                run sequentially. On device='cpu' the worker uses one BLAS/OpenMP thread; the
+                model's torch threads are not limited (see torch.set_num_threads).
+            queue_size: Maximum number of post-processing jobs in flight. The default lets the
+                FC2 job and the stability check both be queued while FC3 forces run.
+            stability_policy: Action on imaginary modes in FC2, checked before the FC3
+                forces are used: 'abort' (raise DynamicalInstabilityError, stability.dat
+                is kept), 'flag' (continue, write IMAGINARY_MODES) or 'continue'.
+            imag_tol: Frequencies below -imag_tol (THz) count as imaginary.
         """
         if temp_range is None:
             temp_range = np.arange(0, 1001, 10)
+        StabilitySet.check_policy(stability_policy)
+        stability_set = StabilitySet(imag_tol=imag_tol)
 
         # Prepare directory
         original_dir = os.getcwd()
+        work_dir = os.path.abspath(work_dir)
         if not os.path.exists(work_dir):
             os.makedirs(work_dir)
         
         try:
             os.chdir(work_dir)
             
-            atoms_ase = self._ensure_ase_atoms(structure)
-            unitcell = self._to_phonopy_atoms(atoms_ase)
+            atoms_ase = ensure_ase_atoms(structure)
+            unitcell = to_phonopy_atoms(atoms_ase)
 
-            # --- FC3 Calculation ---
+            # --- FC3 Displacements ---
             print("Initializing Phono3py for FC3...")
             ph3 = Phono3py(unitcell,
                            supercell_matrix=dim_fc3,
@@ -82,55 +95,33 @@ class KappaSet:
             supercells = ph3.supercells_with_displacements
             ph3.save("phono3py_disp.yaml")
 
-            forces_fc3 = []
-            for sc in tqdm(supercells, desc="Calculating FC3 Forces"):
-                if sc is None:
-                    forces_fc3.append(None)
-                    continue
-                
-                # Convert Phonopy supercell to ASE Atoms
-                atoms_sc = Atoms(
-                    symbols=sc.symbols,
-                    positions=sc.positions,
-                    cell=sc.cell,
-                    pbc=True
-                )
-                
-                atoms_sc.calc = self.calculator
-                forces = atoms_sc.get_forces()
-                forces_fc3.append(forces)
-
-            write_FORCES_FC3(ph3.dataset, forces_fc3, filename="FORCES_FC3")
-            ph3.forces = np.array(forces_fc3, dtype='double', order='C')
-            ph3.produce_fc3()
-            ph3.save("fc3.hdf5")
-
-            # --- FC2 Calculation ---
-            print("Calculating FC2...")
-            ph2 = Phonopy(unitcell,
-                          supercell_matrix=dim_fc2,
-                          primitive_matrix=primitive_matrix)
-            ph2.generate_displacements(distance=0.01)
-            supercells_fc2 = ph2.supercells_with_displacements
-            forces_fc2 = []
-            for sc in tqdm(supercells_fc2, desc="Calculating FC2 Forces"):
-                if sc is None:
-                    forces_fc2.append(None)
-                    continue
-                
-                atoms_sc = Atoms(
-                    symbols=sc.symbols,
-                    positions=sc.positions,
-                    cell=sc.cell,
-                    pbc=True
-                )
-                atoms_sc.calc = self.calculator
-                forces = atoms_sc.get_forces()
-                forces_fc2.append(forces)
-
-            ph2.forces = forces_fc2
-            ph2.produce_force_constants()
-            write_force_constants_to_hdf5(ph2.force_constants, filename='fc2.hdf5')
+            # FC2 is computed first: FC2 and the stability check run on the worker process
+            # while the model moves on to FC3 forces, which stop early if the check aborts.
+            # Leaving the block joins the worker, also on errors, before the cwd is restored,
+            # and re-raises a DynamicalInstabilityError from the check.
+            with StagePipeline(maxsize=queue_size, enabled=is_pipeline) as pipeline:
+                # --- FC2 Calculation ---
+                print("Calculating FC2...")
+                ph2 = Phonopy(unitcell,
+                              supercell_matrix=dim_fc2,
+                              primitive_matrix=primitive_matrix)
+                ph2.generate_displacements(distance=0.01)
+                supercells_fc2 = ph2.supercells_with_displacements
+                with pipeline.forces():
+                    forces_fc2 = calc_supercell_forces(self.calculator, supercells_fc2, desc="Calculating FC2 Forces")
+                ph2.forces = forces_fc2
+                fc2_job = pipeline.submit(KappaSet._produce_fc2, ph2, work_dir)
+                pipeline.submit(stability_set.check, ph2, policy=stability_policy, calcu_dir=work_dir)
+
+                with pipeline.forces():
+                    forces_fc3 = calc_supercell_forces(self.calculator, supercells, desc="Calculating FC3 Forces",
+                                                       stop=lambda: bool(pipeline.errors))
+                if not pipeline.errors:
+                    fc3_job = pipeline.submit(KappaSet._produce_fc3, ph3, forces_fc3, work_dir)
+            pipeline.report(label='Kappa')
+            # jobs run on copies in the worker process, so take the force constants from their results
+            ph2.force_constants = pipeline.results[fc2_job]
+            ph3.fc3 = pipeline.results[fc3_job]
 
             # --- Thermal Conductivity ---
             print("Calculating Thermal Conductivity...")
@@ -1,8 +1,11 @@
 import os
 from ase import Atoms
 from mattersim.applications.phonon import PhononWorkflow
+from phonopy import Phonopy
 from phonopy.file_IO import write_FORCE_CONSTANTS, write_FORCE_SETS
 
+from calculators.structure_utils import to_phonopy_atoms, calc_supercell_forces
+
 class PhononSet:
 
     def __init__(self, calculator, **kwargs):
@@ -26,20 +29,51 @@ class PhononSet:
         #         write_FORCE_SETS(dataset, filename=os.path.join(calcu_dir, "FORCE_SETS"))
         
         if if_thermal:
-            try:
-                phonons.run_mesh(mesh=mesh)
-                phonons.run_thermal_properties(t_max=t_max)
-                phonons.write_yaml_thermal_properties(filename=os.path.join(calcu_dir, 'thermal_properties.yaml'))
-                phonons.write_total_dos(filename=os.path.join(calcu_dir, 'dos.dat'))
-                
-                tp_dict = phonons.get_thermal_properties_dict()
-                with open(os.path.join(calcu_dir, 'thermal_properties.dat'), 'w') as f:
-                    f.write("# T [K], F [kJ/mol], S [J/K/mol], Cv [J/K/mol]\n")
-                    for t, F, S, Cv in zip(tp_dict['temperatures'], tp_dict['free_energy'], tp_dict['entropy'], tp_dict['heat_capacity']):
-                        f.write(f"{t:12.6f} {F:12.6f} {S:12.6f} {Cv:12.6f}\n")
-
-                print(f"Thermal properties written to {os.path.join(calcu_dir, 'thermal_properties.yaml')} and thermal_properties.dat")
-            except Exception as e:
-                print(f"Could not calculate or write thermal properties: {e}")
-
-        return has_imag
\ No newline at end of file
+            self.write_thermal(phonons, calcu_dir=calcu_dir, mesh=mesh, t_max=t_max)
+
+        return has_imag
+
+    def run_phonon(self, atoms:Atoms, supercell_matrix, amplitude: float = 0.01):
+        """Force evaluation stage: only the model calls on the displaced supercells."""
+        phonons = Phonopy(to_phonopy_atoms(atoms), supercell_matrix=supercell_matrix)
+        phonons.generate_displacements(distance=amplitude)
+        phonons.forces = calc_supercell_forces(self.calculator, phonons.supercells_with_displacements)
+        return phonons
+
+    @staticmethod
+    def post_phonon(phonons, calcu_dir: str, mesh: list = [30, 30, 30], t_max: int = 1000, if_thermal: bool = False, imag_tol: float = 0.1):
+        """
+        Post-processing stage of run_phonon: force constants, mesh and output files.
+
+        Makes no model calls and is a static method, so it can run in a pipeline worker process.
+        """
+        if phonons.force_constants is None:
+            phonons.produce_force_constants()
+        phonons.save(filename=os.path.join(calcu_dir, 'phonopy_params.yaml'))
+        if if_thermal:
+            PhononSet.write_thermal(phonons, calcu_dir=calcu_dir, mesh=mesh, t_max=t_max)
+        else:
+            phonons.run_mesh(mesh=mesh)
+
+        has_imag = bool(phonons.get_mesh_dict()['frequencies'].min() < -imag_tol)
+        print(f"Has imaginary phonon: {has_imag}")
+        return has_imag
+
+    @staticmethod
+    def write_thermal(phonons, calcu_dir: str, mesh: list = [30, 30, 30], t_max: int = 1000):
+        """Mesh, thermal properties and DOS files (no model calls)."""
+        try:
+            phonons.run_mesh(mesh=mesh)
+            phonons.run_thermal_properties(t_max=t_max)
+            phonons.write_yaml_thermal_properties(filename=os.path.join(calcu_dir, 'thermal_properties.yaml'))
+            phonons.write_total_dos(filename=os.path.join(calcu_dir, 'dos.dat'))
+            
+            tp_dict = phonons.get_thermal_properties_dict()
+            with open(os.path.join(calcu_dir, 'thermal_properties.dat'), 'w') as f:
+                f.write("# T [K], F [kJ/mol], S [J/K/mol], Cv [J/K/mol]\n")
+                for t, F, S, Cv in zip(tp_dict['temperatures'], tp_dict['free_energy'], tp_dict['entropy'], tp_dict['heat_capacity']):
+                    f.write(f"{t:12.6f} {F:12.6f} {S:12.6f} {Cv:12.6f}\n")
+
+            print(f"Thermal properties written to {os.path.join(calcu_dir, 'thermal_properties.yaml')} and thermal_properties.dat")
+        except Exception as e:
+            print(f"Could not calculate or write thermal properties: {e}")
\ No newline at end of file
@@ -0,0 +1,168 @@
+import time
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from threadpoolctl import threadpool_limits
+
+# one job running in the worker plus one waiting, so the next job is ready as soon as the worker frees up
+DEFAULT_QUEUE_SIZE = 2
+
+
+def _limit_worker_threads(n_threads):
+    """Worker initializer: cap BLAS/OpenMP threads so the worker does not compete with the model for all cores."""
+    threadpool_limits(limits=n_threads)
+
+
+def _timed_call(func, args, kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+class StagePipeline:
+    """
+    Two-stage pipeline: the caller evaluates forces (model-bound) while a
+    separate worker process runs post-processing jobs (phonopy/phono3py,
+    numpy, file writes), so the two stages do not share the GIL.
+
+    Jobs are pickled to the worker: they must be module-level functions,
+    static methods or methods of objects without a calculator, and they
+    must return what the caller needs instead of modifying their arguments.
+
+    Args:
+        maxsize: Maximum number of post-processing jobs in flight (running or
+            waiting). When reached, submit() blocks the force stage.
+        enabled: If False, jobs run inline in submit() (sequential execution).
+        worker_threads: BLAS/OpenMP threads of the worker process. The model's
+            own threads (e.g. torch on device='cpu') are not limited here; set
+            them with torch.set_num_threads so both stages fit on the cores.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE, enabled: bool = True, worker_threads: int = 1):
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.worker_threads = worker_threads
+        self.busy = {'forces': 0.0, 'post': 0.0}
+        self.results = []
+        self._errors = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._t_start = None
+        self._t_end = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # always wait for the worker, so no job outlives the caller's context (e.g. cwd)
+        self.join(raise_errors=exc_type is None)
+        return False
+
+    def start(self):
+        self._t_start = time.perf_counter()
+        if self.enabled:
+            self._executor = ProcessPoolExecutor(max_workers=1,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_limit_worker_threads,
+                                                 initargs=(self.worker_threads,))
+
+    @property
+    def errors(self):
+        """Exceptions raised by finished jobs so far."""
+        with self._lock:
+            return list(self._errors)
+
+    @contextlib.contextmanager
+    def forces(self):
+        """Time a block of force evaluation on the calling thread."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.busy['forces'] += time.perf_counter() - t0
+
+    @contextlib.contextmanager
+    def post(self):
+        """Time a block of post-processing that has to run on the calling thread."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.busy['post'] += time.perf_counter() - t0
+
+    def submit(self, func, *args, **kwargs):
+        """Queue a post-processing job; returns its index in self.results."""
+        with self._lock:
+            index = len(self.results)
+            self.results.append(None)
+        if not self.enabled:
+            try:
+                result, elapsed = _timed_call(func, args, kwargs)
+                self._store(index, result, elapsed)
+            except Exception as e:
+                with self._lock:
+                    self._errors.append(e)
+            return index
+
+        while len(self._pending) >= self.maxsize:
+            done, _ = wait(list(self._pending), return_when=FIRST_COMPLETED)
+            self._collect(done)
+        future = self._executor.submit(_timed_call, func, args, kwargs)
+        self._pending[future] = index
+        future.add_done_callback(lambda f: self._collect([f]))
+        return index
+
+    def join(self, raise_errors: bool = True):
+        """Wait for all queued jobs, then re-raise the first worker error."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._collect(list(self._pending))
+            self._executor = None
+        self._t_end = time.perf_counter()
+        if raise_errors and self._errors:
+            raise self._errors[0]
+        return self.results
+
+    def _collect(self, futures):
+        for future in futures:
+            with self._lock:
+                index = self._pending.pop(future, None)
+            if index is None:
+                continue
+            try:
+                result, elapsed = future.result()
+                self._store(index, result, elapsed)
+            except Exception as e:
+                with self._lock:
+                    self._errors.append(e)
+
+    def _store(self, index, result, elapsed):
+        with self._lock:
+            self.results[index] = result
+            self.busy['post'] += elapsed
+
+    def report(self, label: str = 'Pipeline'):
+        """
+        Print busy time per stage against wall time.
+
+        Busy times are perf_counter wall times: 'forces' on the calling thread,
+        'post' inside the worker process (plus post() blocks on the calling thread).
+        The sequential-equivalent time is their sum; wall time below it is real
+        overlap, since the worker is a separate process and does not wait on the GIL.
+        """
+        end = self._t_end if self._t_end is not None else time.perf_counter()
+        wall = max(end - self._t_start, 1e-12)
+        sequential = self.busy['forces'] + self.busy['post']
+        overlap = max(sequential - wall, 0.0)
+        mode = 'worker process' if self.enabled else 'sequential'
+        print(f"{label} stage utilisation ({mode}, busy = perf_counter wall time per stage):")
+        for stage, busy in self.busy.items():
+            print(f"  {stage:<7s} busy {busy:10.2f} s  ({100 * busy / wall:5.1f}% of wall)")
+        print(f"  sequential-equivalent {sequential:.2f} s, wall {wall:.2f} s, "
+              f"overlap {overlap:.2f} s, speed-up {sequential / wall:.2f}x")
+        return {'wall': wall, 'sequential': sequential, 'overlap': overlap, **self.busy}
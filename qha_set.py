@@ -13,18 +13,41 @@ from phonopy import PhonopyQHA
 from calculators.file_utils import check_and_new_path
 from calculators.relax_set import Relaxer
 from calculators.phonon_set import PhononSet
+from calculators.pipeline_utils import StagePipeline, DEFAULT_QUEUE_SIZE
+from calculators.stability_set import StabilitySet, DynamicalInstabilityError
 
 CWD = os.path.dirname(os.path.abspath(__file__))
 multiprocessing.set_start_method('spawn', force=True)
 
 class QHASet():
-    def __init__(self, calculator, device='cpu', dim=[2, 2, 2], mesh=[30, 30, 30], n=11, nscale=0.003, is_rm_dir=True, **kwargs):
+    def __init__(self, calculator, device='cpu', dim=[2, 2, 2], mesh=[30, 30, 30], n=11, nscale=0.003, is_rm_dir=True, is_pipeline=True, queue_size=DEFAULT_QUEUE_SIZE, stability_policy='abort', imag_tol=0.1, **kwargs):
+        """
+        Initialize the QHASet with a calculator.
+
+        Args:
+            calculator: An ASE-compatible calculator object (e.g., from MatterSim, MACE, etc.)
+            dim: Supercell, 3 elements (diagonal) or 9 elements (full 3x3 matrix).
+            mesh: q-point mesh for thermal properties.
+            n: Number of volumes.
+            nscale: Linear scaling step between volumes.
+            is_rm_dir: If True, the phonon_* directory is removed when the stability check
+                aborts; calcu_dir and its stability.dat are always kept.
+            is_pipeline: If True, post-processing of each volume runs in a worker process
+                while the model evaluates the next volume's forces. If False, run sequentially.
+            queue_size: Maximum number of post-processing jobs in flight.
+            stability_policy: Action on imaginary modes at the equilibrium volume, checked before
+                the other n-1 volumes: 'abort' (raise DynamicalInstabilityError), 'flag'
+                (continue, write IMAGINARY_MODES) or 'continue'.
+            imag_tol: Frequencies below -imag_tol (THz) count as imaginary.
+        """
         self.device = device
         self.mesh = mesh
         self.n = n
         self.nscale = nscale
         self.calculator = calculator
         self.is_rm_dir = is_rm_dir
+        self.is_pipeline = is_pipeline
+        self.queue_size = queue_size
         
         self.dim = np.array(dim)
         if len(self.dim) == 3:
@@ -33,11 +56,14 @@ class QHASet():
             self.supercell_matrix = self.dim.reshape(3, 3)
         else:
             raise ValueError("dim must contain either 3 elements (diagonal) or 9 elements (full 3x3 matrix)")
+
+        self.stability_policy = StabilitySet.check_policy(stability_policy)
+        self.stability_set = StabilitySet(imag_tol=imag_tol)
     
     def _format_phonopy_dim(self):
         return ' '.join(map(str, self.supercell_matrix.flatten()))
 
-    def get_gruneisen(self, struct: Structure, calcu_dir=r'./gruneisen_tmp', fmax=0.01, steps=1000, t_max=1000, **kwargs):
+    def get_gruneisen(self, struct: Structure, calcu_dir=r'./gruneisen_tmp', fmax=0.01, steps=1000, t_max=1000, amplitude=0.01):
         calcu_dir = check_and_new_path(calcu_dir)
         calcu_dir = os.path.abspath(calcu_dir)
         
@@ -45,64 +71,65 @@ class QHASet():
         relaxer = Relaxer(calculator=self.calculator, optimizer="BFGS")
         relaxed_atoms = relaxer.relax(structure=struct, fmax=fmax, steps=steps, relax_cell=True, verbose=False)
 
-
         # 2. phonon calculation at equilibrium volume
+        # Force evaluation runs on this thread; force constants, mesh/DOS/YAML
+        # post-processing of each volume is queued to a worker process so the
+        # model never waits on phonopy. Leaving the block joins the worker, so
+        # all thermal_properties.yaml files exist before phonopy-qha runs.
         phonon_set = PhononSet(calculator=self.calculator)
         central_index = (self.n - 1) // 2
-        phonon_dir_central = os.path.join(calcu_dir, f'phonon_{central_index}')
-        os.makedirs(phonon_dir_central, exist_ok=True)
-        energy_orig = relaxed_atoms.get_potential_energy()
-        volume_orig = relaxed_atoms.get_volume()
-        has_imag = phonon_set.get_phonon(
-            relaxed_atoms,
-            calcu_dir=phonon_dir_central,
-            supercell_matrix=self.supercell_matrix,
-            mesh=self.mesh,
-            t_max=t_max,
-            if_thermal=True,
-            **kwargs
-        )
+        jobs = {}
+        with StagePipeline(maxsize=self.queue_size, enabled=self.is_pipeline) as pipeline:
+            phonon_dir_central = os.path.join(calcu_dir, f'phonon_{central_index}')
+            os.makedirs(phonon_dir_central, exist_ok=True)
+            energy_orig = relaxed_atoms.get_potential_energy()
+            volume_orig = relaxed_atoms.get_volume()
+            with pipeline.forces():
+                phonons = phonon_set.run_phonon(relaxed_atoms, supercell_matrix=self.supercell_matrix, amplitude=amplitude)
+            # stability check on the equilibrium force constants before the other n-1 volumes;
+            # with policy 'abort' this raises DynamicalInstabilityError and keeps calcu_dir/stability.dat
+            with pipeline.post():
+                phonons.produce_force_constants()
+                try:
+                    self.stability_set.check(phonons, policy=self.stability_policy, calcu_dir=calcu_dir)
+                except DynamicalInstabilityError:
+                    if self.is_rm_dir:
+                        shutil.rmtree(phonon_dir_central)
+                    raise
+            jobs[central_index] = pipeline.submit(PhononSet.post_phonon, phonons, calcu_dir=phonon_dir_central, mesh=self.mesh, t_max=t_max, if_thermal=True)
 
-        # if has_imag:
-        #     print("\nERROR: Imaginary phonon frequencies detected in the equilibrium structure. QHA calculation aborted.")
-        #     if self.is_rm_dir:
-        #         shutil.rmtree(calcu_dir)
-        #     return
+            # 3. Calculate energies and phonons at different volumes and immediately extract thermal properties
+            e_list = []
+            v_list = []
+            
+            for i in range(self.n):
+                # a failed post-processing job is re-raised when the block exits; stop computing forces
+                if pipeline.errors:
+                    break
+                if i == central_index:
+                    e_list.append(energy_orig)
+                    v_list.append(volume_orig)
+                    continue
 
-        # 3. Calculate energies and phonons at different volumes and immediately extract thermal properties
-        e_list = []
-        v_list = []
-        
-        for i in range(self.n):
-            if i == central_index:
-                e_list.append(energy_orig)
-                v_list.append(volume_orig)
-                continue
+                scale_factor = 1 + (i - (self.n - 1) / 2) * self.nscale
+                scaled_atoms = relaxed_atoms.copy()
+                scaled_atoms.set_calculator(self.calculator)
+                scaled_atoms.set_cell(scaled_atoms.get_cell() * scale_factor, scale_atoms=True)
+                
+                phonon_dir = os.path.join(calcu_dir, f'phonon_{i}')
+                os.makedirs(phonon_dir, exist_ok=True)
 
-            scale_factor = 1 + (i - (self.n - 1) / 2) * self.nscale
-            scaled_atoms = relaxed_atoms.copy()
-            scaled_atoms.set_calculator(self.calculator)
-            scaled_atoms.set_cell(scaled_atoms.get_cell() * scale_factor, scale_atoms=True)
-            
-            volume = scaled_atoms.get_volume()
-            energy = scaled_atoms.get_potential_energy()
-            e_list.append(energy)
-            v_list.append(volume)
-            
-            phonon_dir = os.path.join(calcu_dir, f'phonon_{i}')
-            os.makedirs(phonon_dir, exist_ok=True)
+                with pipeline.forces():
+                    volume = scaled_atoms.get_volume()
+                    energy = scaled_atoms.get_potential_energy()
+                    phonons = phonon_set.run_phonon(scaled_atoms, supercell_matrix=self.supercell_matrix, amplitude=amplitude)
+                e_list.append(energy)
+                v_list.append(volume)
+                jobs[i] = pipeline.submit(PhononSet.post_phonon, phonons, calcu_dir=phonon_dir, mesh=self.mesh, t_max=t_max, if_thermal=True)
+        pipeline.report(label='QHA')
 
-            has_imag_scaled = phonon_set.get_phonon(
-                scaled_atoms, 
-                calcu_dir=phonon_dir, 
-                supercell_matrix=self.supercell_matrix, 
-                mesh=self.mesh, 
-                t_max=t_max,
-                if_thermal=True,
-                **kwargs
-            )
-            
-            if has_imag_scaled:
+        for i, volume in enumerate(v_list):
+            if pipeline.results[jobs[i]]:
                 print(f"Warning: Imaginary phonon frequencies detected for volume {volume:.2f} Å^3.")
         
         # 4. Prepare input for phonopy-qha and run QHA analysis
@@ -0,0 +1,89 @@
+import os
+import numpy as np
+from phonopy.harmonic.dynmat_to_fc import get_commensurate_points
+
+STABILITY_POLICIES = ('abort', 'flag', 'continue')
+
+
+class DynamicalInstabilityError(Exception):
+    """Raised by StabilitySet.check with policy 'abort' when imaginary modes are found."""
+
+    def __init__(self, min_freq, calcu_dir=None):
+        self.min_freq = min_freq
+        self.calcu_dir = calcu_dir
+        super().__init__(f"Imaginary phonon frequencies detected (lowest {min_freq:.4f} THz)"
+                         + (f", see {os.path.join(calcu_dir, 'stability.dat')}" if calcu_dir is not None else ""))
+
+
+class StabilitySet:
+    def __init__(self, imag_tol=0.1):
+        """
+        Dynamical stability check on force constants a workflow has already computed
+        (QHA: the equilibrium volume, kappa: FC2), so it costs no extra force calls.
+
+        Frequencies are evaluated only at the q-points commensurate with the supercell
+        the force constants were built on, where they are exact rather than interpolated.
+
+        Args:
+            imag_tol: Frequencies below -imag_tol (THz) count as imaginary.
+        """
+        self.imag_tol = imag_tol
+
+    @staticmethod
+    def check_policy(policy):
+        if policy not in STABILITY_POLICIES:
+            raise ValueError(f"Stability policy '{policy}' not recognized. Available options: {list(STABILITY_POLICIES)}")
+        return policy
+
+    def get_frequencies(self, phonons):
+        """
+        Frequencies (THz) at the commensurate q-points of a Phonopy object with force constants.
+
+        Returns:
+            (qpoints, frequencies): q-points in the primitive reciprocal basis and
+            frequencies with shape (n_qpoints, n_bands).
+        """
+        # supercell lattice in units of the primitive lattice (phonopy column convention)
+        smat = np.dot(phonons.supercell.cell, np.linalg.inv(phonons.primitive.cell)).T
+        qpoints = get_commensurate_points(np.rint(smat).astype(int))
+        phonons.run_qpoints(qpoints)
+        return qpoints, phonons.get_qpoints_dict()['frequencies']
+
+    def check(self, phonons, policy='abort', calcu_dir=None):
+        """
+        Check for imaginary modes, write stability.dat and apply the policy.
+        Force constants are produced from phonons.forces if not set yet.
+
+        Args:
+            policy: 'abort' raises DynamicalInstabilityError, 'flag' continues but writes
+                an IMAGINARY_MODES marker to calcu_dir, 'continue' only reports.
+
+        Returns:
+            True if no imaginary modes were found.
+        """
+        self.check_policy(policy)
+        if phonons.force_constants is None:
+            phonons.produce_force_constants()
+        qpoints, frequencies = self.get_frequencies(phonons)
+        min_freq = float(frequencies.min())
+        is_stable = min_freq >= -self.imag_tol
+
+        if calcu_dir is not None:
+            with open(os.path.join(calcu_dir, 'stability.dat'), 'w') as f:
+                f.write(f"# stable: {is_stable}, lowest frequency {min_freq:.6f} THz, imag_tol = {self.imag_tol} THz\n")
+                f.write("# qx qy qz, lowest frequency [THz]\n")
+                for q, freqs in zip(qpoints, frequencies):
+                    f.write(f"{q[0]:9.6f} {q[1]:9.6f} {q[2]:9.6f} {freqs.min():12.6f}\n")
+
+        print(f"Stability check: lowest frequency {min_freq:.4f} THz, stable: {is_stable}")
+        if is_stable:
+            return True
+
+        if policy == 'abort':
+            raise DynamicalInstabilityError(min_freq, calcu_dir=calcu_dir)
+        if policy == 'flag':
+            print("Warning: Imaginary phonon frequencies detected in the stability check. Continuing (flagged).")
+            if calcu_dir is not None:
+                with open(os.path.join(calcu_dir, 'IMAGINARY_MODES'), 'w') as f:
+                    f.write(f"{min_freq:.6f}\n")
+        return False
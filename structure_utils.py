@@ -0,0 +1,52 @@
+from tqdm import tqdm
+from ase import Atoms
+from pymatgen.core import Structure
+from pymatgen.io.ase import AseAtomsAdaptor
+from phonopy.structure.atoms import PhonopyAtoms
+
+
+def ensure_ase_atoms(structure):
+    """Ensure input is ASE Atoms."""
+    if isinstance(structure, Atoms):
+        return structure
+    elif isinstance(structure, Structure):
+        return AseAtomsAdaptor.get_atoms(structure)
+    else:
+        raise ValueError(f"Unsupported structure type: {type(structure)}")
+
+
+def to_phonopy_atoms(atoms: Atoms):
+    """Convert ASE Atoms to PhonopyAtoms."""
+    return PhonopyAtoms(symbols=atoms.get_chemical_symbols(),
+                        masses=atoms.get_masses(),
+                        positions=atoms.get_positions(),
+                        cell=atoms.get_cell())
+
+
+def calc_supercell_forces(calculator, supercells, desc=None, stop=None):
+    """
+    Evaluate forces on displaced Phonopy supercells with the calculator.
+
+    Args:
+        desc: tqdm progress bar label; no progress bar if None.
+        stop: Optional callable checked before each supercell; evaluation ends early when it returns True.
+    """
+    forces_list = []
+    for sc in tqdm(supercells, desc=desc, disable=desc is None):
+        if stop is not None and stop():
+            break
+        if sc is None:
+            forces_list.append(None)
+            continue
+
+        # Convert Phonopy supercell to ASE Atoms
+        atoms_sc = Atoms(
+            symbols=sc.symbols,
+            positions=sc.positions,
+            cell=sc.cell,
+            pbc=True
+        )
+
+        atoms_sc.calc = calculator
+        forces_list.append(atoms_sc.get_forces())
+    return forces_list